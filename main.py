@@ -6,21 +6,125 @@ from src.opeval import OperatorHandler, OperatorEvaluator, OperatorRelation, OrR
 import string
 from src.standard import Standardizer
 from src.rank import RelevanceRanker
+from functools import cached_property
+from itertools import chain
+from collections import OrderedDict
 import time
+import re
+
+# A hyphen with a letter on at least one side is part of a word (or name) rather than a range (see tokenize).
+#  However, 'K' cannot count for the left side, since it is often an abbreviation for thousand.
+RANGE_HYPHEN = re.compile(r'(?<=[^A-JL-Za-z])-(?=[^A-Za-z])')
+# Captures the parenthesized qualifiers of a standardized operation, such as the unit in '<= (mi) [.]'
+PARENS = re.compile(r'\(([^)]*)\)')
+# The domain for each label the classifier can give a query
+CLASSIFIED_DOMAINS = {
+    "car": Domain.CAR,
+    "furniture": Domain.FURNITURE,
+    "housing": Domain.HOUSING,
+    "jewelry": Domain.JEWELRY,
+    "computer science jobs": Domain.JOB,
+    "motorcycles": Domain.MOTORCYCLE
+}
+
+# There is nowhere else that Type II attributes are saved for each table.
+#  Thus, the data is here:
+TYPE2_COLS = {
+    Domain.CAR: (1, 6, 8, 10, 11, 12, 13, 14, 15, 16),
+    Domain.FURNITURE: (8, 9),
+    Domain.HOUSING: (0, 1, 15, 18),
+    Domain.JEWELRY: (4, 5),  # maybe the title should be considered an indexing key...
+    Domain.JOB: (3, 5, 6, 7, 9, 10, 11, 13),
+    Domain.MOTORCYCLE: (3,)
+}
+
+# The number of runs of tokens whose constraints are remembered (see __cachedWhere)
+WHERE_CACHE_SIZE = 256
 
 
 class ConstraintBuilder():
 
     def __init__(self):
-        import src.multinomial_classification.run_classifier as classify
-        self.classifier = classify.Classifier()
         self.extractor = TypeExtractor()
 
         # Set up the bounding and superlative handler
         self.operatorHandler = OperatorHandler()
 
+        # The same (table, column, value) LIKE probes recur across the Type I and Type II passes,
+        #  so we remember whether each found a match rather than searching the column again.
+        self.likeCache = dict()
+        # The length of the longest value in each (table, column). Longer values cannot be found there.
+        self.colMaxLen = dict()
+        # The constraints found for the most recently used runs of tokens (at most WHERE_CACHE_SIZE of them),
+        #  so that a run seen in an earlier query is not analyzed again. The least recently used is first.
+        self.whereCache = OrderedDict()
+
+    @cached_property
+    def classifier(self):
+        '''
+        The domain classifier. Importing it (which brings in its language models) and loading its model are
+        expensive, so both are only done the first time the classifier is needed (most of the constraint
+        building does not use it).
+        '''
+        import src.multinomial_classification.run_classifier as classify
+        return classify.Classifier()
+
     def __matchWhere(self, name: string, value: string) -> string:
-        return name + ' LIKE "% ' + value + ' %"'
+        return f'{name} LIKE "% {value} %"'
+
+    def __matchParam(self, name: string, value: string) -> (string, string):
+        """
+        The parameterized form of __matchWhere, used for the probes made while matching columns. Since the SQL
+        text is the same for every value in the column, the database can reuse the statement it compiled.
+        @param name: the name of the column to search in
+        @param value: the token value to search for
+        @return the where clause, and the pattern to bind to its parameter
+        """
+        return f'{name} LIKE ?', f'% {value} %'
+
+    def __likeExists(self, table: database.Table, col: int, name: string, value: string) -> bool:
+        """
+        Determines whether any entry in the column contains the value as a whole-word substring.
+        Results are memoized per table, column, and (case-insensitive) value.
+        @param table: the table to search
+        @param col: the index of the column to search in
+        @param name: the name of the column to search in
+        @param value: the token value to search for
+        @return whether there was at least one match
+        """
+        return len(self.__whichColsMatch(table, {col: name}, value)) > 0
+
+    def __whichColsMatch(self, table: database.Table, names: {int: string}, value: string) -> [int]:
+        """
+        Finds which of the given columns contain the value as a whole-word substring. The columns are
+        searched in memory, except for values with LIKE wildcards, which need the database to match them.
+        All such columns not already memoized are checked together in a single database statement.
+        @param table: the table to search
+        @param names: the names of the columns to search in, keyed by the column index
+        @param value: the token value to search for
+        @return the columns (in the order given) that had at least one match
+        """
+        lowered = value.lower()
+        wildcard = '_' in value or '%' in value
+        cols = names.keys()
+        unknown = []
+        for col in cols:
+            key = (table.name, col, lowered)
+            if key in self.likeCache:
+                continue
+            if wildcard:
+                unknown.append(col)
+            else:
+                self.likeCache[key] = database.contains(table, col, value)
+        wheres = []
+        patterns = []
+        for col in unknown:
+            where, pattern = self.__matchParam(names[col], value)
+            wheres.append(where)
+            patterns.append(pattern)
+        for col, found in zip(unknown, database.exists(table, wheres, patterns)):
+            self.likeCache[(table.name, col, lowered)] = found
+        return [col for col in cols if self.likeCache[(table.name, col, lowered)]]
 
     def __extractOfType(self, typed: [[string, int]], toExtract: int) -> [string]:
         """
@@ -29,11 +133,7 @@ class ConstraintBuilder():
         @param toExtract: the type to extract. Expected in 1-indexed. For example, Type I should be 1.
         @return a list of the string tokens that match the required type
         """
-        ofType = []
-        for token in typed:
-            if token[1] == toExtract:
-                ofType.append(token[0])
-        return ofType
+        return [value for value, typeNum in typed if typeNum == toExtract]
 
     def __matchColumns(self, typeValues: [string], typeCols: [int], table: database.Table) -> [[string, [int]]]:
         """
@@ -45,18 +145,33 @@ class ConstraintBuilder():
         index is the column(s) found for that string token. For example: [['foo', [0,1]], ['bar', [1]]]
         """
         matchList = []
+        # Look up the column names once rather than for every token
+        names = {col: table.colNames[col] for col in typeCols}
+        # A token repeated in the query matches the same columns each time. Every occurrence is still listed
+        #  (since __reduce depends on the positions), but the columns are only looked up once.
+        seen = dict()
         for token in typeValues:
-            matched = []
-            for col in typeCols:
-                where = self.__matchWhere(table.dat[col][0][0], token)
-                # print(where)
-                result = database.query(table, [col], where)
-                if len(result) > 0:  # If there was some match in this column
-                    matched.append(col)
+            # Find all the columns where there was some match
+            if token not in seen:
+                seen[token] = self.__whichColsMatch(table, names, token)
+            matched = seen[token]
             if len(matched) > 0:
                 matchList.append([token, matched])
         return matchList
 
+    def __maxLength(self, table: database.Table, col: int) -> int:
+        """
+        Gets the length of the longest value in the column, memoized per table and column. A combined token
+        that is longer than that (with its padding spaces) cannot be found in the column.
+        @param table: the table the column is in
+        @param col: the index of the column
+        @return the length of the longest value in the column
+        """
+        key = (table.name, col)
+        if key not in self.colMaxLen:
+            self.colMaxLen[key] = database.maxLength(table, col)
+        return self.colMaxLen[key]
+
     def __reduce(self, matchList: [[string, [int]]], table: database.Table) -> [[[string, int]]]:
         """
         Attempts to reduce the match list (as returned from __matchColumns) by combining sequential tokens of the
@@ -79,83 +194,88 @@ class ConstraintBuilder():
         # Therefore, we simplify the given structure to only have one possible row and create a list for
         #  each possible position
 
-        # ls is where we will save all the positional tokens. It must be the length of the original match list
-        ls = []
-        for _ in range(len(matchList)):
-            ls.append([])
+        # ls is where we will save all the positional tokens. It must be the length of the original match list.
+        #  Each position maps a column to the token found there for that column and the positions it covers.
+        ls = [dict() for _ in range(len(matchList))]
         # Now we break each token into all its rows and put it in its place
         for i in range(len(matchList)):
             matched = matchList[i]
             for col in matched[1]:
-                ls[i].append([matched[0], col, [i]])
+                ls[i][col] = [matched[0], [i]]
 
         # With our new structure, we want to go through each index (starting at 1) to the end and try to match
-        #  with the index immediately before if the columns match
-        i = 1
-        while i < len(matchList):
-            c = 0
-            while c < len(ls[i]):
-                curr = ls[i][c]
-                a = 0
-                while a < len(ls[i - 1]):
-                    last = ls[i - 1][a]
-                    # Verify that the cols of curr and last match
-                    if curr[1] != last[1]:
-                        a += 1
-                        continue
-                    col = curr[1]
-
-                    # We will try to combine sequentially, then backwards
-                    ariadne = False
-                    tryNames = [(matchList[i - 1][0] + ' ' + matchList[i][0]),
-                                (matchList[i][0] + ' ' + matchList[i - 1][0])]
-                    for tryName in tryNames:
-                        # The form 'column LIKE "%token%"' will match any entry where the column contains the substring "token".
-                        where = self.__matchWhere(table.dat[col][0][0], tryName)
-                        if len(database.query(table, [col], where)):
-                            # There was a match, therefore we need to remove both curr and last from their respective lists
-                            ls[i].pop(c)
-                            ls[i - 1].pop(a)
-                            # It is replaced by the new joint entry
-                            ls[i].insert(0, [tryName, col,
-                                             last[2] + curr[2]])  # insert at the beginning so we don't redo it
-                            # We only use the first combination that succeeds for this pair
-                            # redo the index for a since we deleted what was there
-                            # get the next index c
-                            ariadne = True
-                            break
-                    if ariadne:
+        #  with the index immediately before. Only entries for the same column can be combined, so we need only
+        #  look at the columns the two positions share.
+        for i in range(1, len(matchList)):
+            shared = [col for col in ls[i] if col in ls[i - 1]]
+            if len(shared) == 0:
+                # Nothing here can be combined with the position before, so there is no need to build the names
+                continue
+            # We will try to combine sequentially, then backwards
+            before, after = matchList[i - 1][0], matchList[i][0]
+            tryNames = [f'{before} {after}']
+            # A repeated token reads the same backwards, so it would only repeat the first probe
+            if before != after:
+                tryNames.append(f'{after} {before}')
+
+            joined = dict()
+            for col in shared:
+                # Entries are stored with a space on either side, so a combination longer than that cannot match
+                if len(tryNames[0]) + 2 > self.__maxLength(table, col):
+                    continue
+                name = table.colNames[col]
+                for tryName in tryNames:
+                    # The form 'column LIKE "%token%"' will match any entry where the column contains the substring "token".
+                    if self.__likeExists(table, col, name, tryName):
+                        # There was a match, therefore we need to remove both curr and last from their respective positions
+                        last = ls[i - 1].pop(col)
+                        curr = ls[i].pop(col)
+                        # It is replaced by the new joint entry
+                        joined[col] = [tryName, last[1] + curr[1]]
+                        # We only use the first combination that succeeds for this pair
                         break
-                    a += 1
-                c += 1
-            i += 1
+            if len(joined) > 0:
+                # The joint entries go at the beginning of the position, the most recently joined first
+                pos = dict(reversed(list(joined.items())))
+                pos.update(ls[i])
+                ls[i] = pos
 
         # After reduction is done, the order does not matter, so we flatten ls
         # A token can only be used once, and we would like to take all the possibilities better into account, but
         #  it may not be worth it to enumerate all interpretations of the query. Therefore, we return a simplified
         #  enumeration and leave a better solution to the reader.
-        ret = []
-        for pos in ls:
-            orList = []
-            for token in pos:
-                orList.append(token)
-            if len(orList) > 0:
-                ret.append(orList)
-
-        return ret
+        # Each column's entry is given as [token, column, positions], and the empty positions are dropped
+        return [[[token[0], col, token[1]] for col, token in pos.items()] for pos in ls if len(pos) > 0]
 
     def __convertToSQL(self, matchList: [[[string, int]]], table: database.Table) -> [string]:
         ret = []
+        names = table.colNames
         for matched in matchList:
             # Inside each match (where each are and-ed), we can have several options, where each should be or-ed
-            where = ''
-            for matchOr in matched:
-                if len(where) > 0:
-                    where += ' OR '
-                where += self.__matchWhere(table.dat[matchOr[1]][0][0], matchOr[0])
-            ret.append(where)
+            ret.append(' OR '.join(self.__matchWhere(names[matchOr[1]], matchOr[0]) for matchOr in matched))
         return ret
 
+    def __cachedWhere(self, where, typed: [[string, int]], table: database.Table, *args) -> [string]:
+        """
+        Finds the constraints of one type for the tokens, reusing the result found for the same tokens before.
+        The constraints depend only on the tokens, the table, and any other arguments given, since the table
+        contents do not change.
+        @param where: the method that finds the constraints (type1Where, type2Where, or type3Where)
+        @param typed: the typified tokens to find constraints for
+        @param table: the table that the constraints are for
+        @param args: any other arguments the method takes
+        @return the constraints found. The list is the caller's own, so it may be modified.
+        """
+        key = (where.__name__, table.name, args, tuple(tuple(token) for token in typed))
+        if key in self.whereCache:
+            self.whereCache.move_to_end(key)
+        else:
+            self.whereCache[key] = where(typed, table, *args)
+            # Every distinct query adds runs, so the least recently used is dropped once the cache is full
+            if len(self.whereCache) > WHERE_CACHE_SIZE:
+                self.whereCache.popitem(last=False)
+        return list(self.whereCache[key])
+
     def type1Where(self, typed: [[string, int]], table: database.Table) -> [string]:
         # We are going to want to pull out all the type Is from the typed query
         typeI = self.__extractOfType(typed, 1)
@@ -199,21 +319,7 @@ class ConstraintBuilder():
     def type2Where(self, typed: [[string, int]], table: database.Table, domain: Domain) -> [string]:
         typeII = self.__extractOfType(typed, 2)
 
-        # There is nowhere else that Type II attributes are saved for each table.
-        #  Thus, the data is here:
-        cols = []
-        if domain == Domain.CAR:
-            cols = [1, 6, 8, 10, 11, 12, 13, 14, 15, 16]
-        elif domain == Domain.FURNITURE:
-            cols = [8, 9]
-        elif domain == Domain.HOUSING:
-            cols = [0, 1, 15, 18]
-        elif domain == Domain.JEWELRY:
-            cols = [4, 5]  # maybe the title should be considered an indexing key...
-        elif domain == Domain.JOB:
-            cols = [3, 5, 6, 7, 9, 10, 11, 13]
-        elif domain == Domain.MOTORCYCLE:
-            cols = [3]
+        cols = TYPE2_COLS.get(domain, ())
 
         matchList = self.__matchColumns(typeII, cols, table)
         matchList = self.__reduce(matchList, table)
@@ -239,129 +345,192 @@ class ConstraintBuilder():
         #  C
         # where i is the row and j is the column.
 
-        breakUp = 0
+        # With fewer than two clauses, there are no pairs to compare
+        if len(constr) <= 1:
+            return constr
+
+        # Only terms on the same attribute can simplify each other, so we keep the set of attributes
+        # used by each OR clause (parallel to constr) and skip any pair of clauses that share none.
+        attrs = [set(term[0] for term in orList) for orList in constr]
+        # If no attribute appears in more than one clause, there is nothing to compare at all
+        seen = set()
+        repeated = False
+        for attrSet in attrs:
+            if not seen.isdisjoint(attrSet):
+                repeated = True
+                break
+            seen.update(attrSet)
+        if not repeated:
+            return constr
+
+        # The same term is compared against many others, so each term's numeric value is parsed only once.
+        # The memo is keyed by the identity of the term (terms move between clauses, but are never copied),
+        # and it holds onto the term itself so that the id cannot be reused while we are working.
+        values = dict()
+        def valueOf(term):
+            found = values.get(id(term))
+            if found is None:
+                found = (term, float(term[2]))
+                values[id(term)] = found
+            return found[1]
+
         i = 0
         while i < len(constr):
             j = i + 1
             while j < len(constr):
-                # We also want to iterate over every term (though typically there is only one)
-                # in the OR clause. We use ii as the iterator over terms in i, and jj for j.
-                ii = 0
-                while ii < len(constr[i]):
-                    first = constr[i][ii]
-                    jj = 0
-                    while jj < len(constr[j]):
-                        second = constr[j][jj]
-                        # no simplification if the constraints are on different attributes
-                        if first[0] != second[0]:
-                            jj += 1
-                            continue
-
-                        # We can combine into BETWEEN if the operations are
-                        #  opposite inclusive bounds that overlap (<= and >=)
-
-                        # If the attributes do match, then we need to perform case analysis on the operators
-                        # < and <= can be simplified by a lower < or <= or BETWEEN
-                        # > and >= can be simplified by a higher > or >= or BETWEEN
-                        # BETWEEN is a combination of both a >= and a <=
-                        # != cannot be simplified, unless in the case of duplication
-                        fVal = float(first[2])
-                        sVal = float(second[2])
-
-                        action = None
-                        merge = None
-                        if first[1] == '<' or first[1] == '<=':
-                            if second[1] == first[1]:
-                                action = fVal <= sVal
-                            # Check for a combination into BETWEEN
-                            elif first[1] == '<=' and second[1] == '>=' and fVal >= sVal:
-                                second[1] = 'BETWEEN'
-                                second.append(first[2])
-                                action = False
-                            elif second[1] == '>' or second[1] == '>=' and fVal <= sVal:
-                                # If we find contradictory requirements, we merge them into
-                                #  one OR clause.
-                                merge = [first, second]
-                        elif first[1] == '>' or first[1] == '>=':
-                            if second[1] == first[1]:
-                                action = fVal >= sVal
-                            # Check (again) for a combination into BETWEEN
-                            elif first[1] == '>=' and second[1] == '<=' and fVal <= sVal:
-                                first[1] = 'BETWEEN'
-                                first.append(second[2])
-                                action = True
-                            elif second[1] == '<' or second[1] == '<=' and fVal >= sVal:
-                                merge = [second, first]
-                        elif (first[1] == '=' or first[1] == '!=') and second[1] == first[1] and fVal == sVal:
-                            action = True
-                        elif (first[1] == 'BETWEEN' or first[1] == 'NOT BETWEEN') and second[1] == first[1]:
-                            if fVal <= sVal and first[3] >= second[3]:
-                                action = True
-                            elif fVal >= sVal and first[3] <= second[3]:
-                                action = False
-
-                        if action is not None:
-                            # reflect the temporaries back to their container
-                            constr[i][ii] = first
-                            constr[j][jj] = second
-                            # If some action is needed, we need to determine what we are going to do.
-                            # We want to delete from the option with more OR constrains.
-                            # True action means the values of the first remain, false indicates of the second
-                            if len(constr[i]) >= len(constr[j]):
-                                if action:  # if the first had the important info, copy it to the second
-                                    constr[j][jj] = first
-                                # Delete the first
-                                constr[i].pop(ii)
-                                ii -= 1
-                                breakUp = 1
-                                if len(constr[i]) == 0:
-                                    constr.pop(i)
-                                    i -= 1
-                                    breakUp += 2
-                            else:
-                                if not action:
-                                    constr[i][ii] = second
-                                constr[j].pop(jj)
-                                continue
-                                if len(constr[j]) == 0:
-                                    constr.pop(j)
-                                    j -= 1
-                                    breakUp = 2
-
-                        if merge is not None and len(constr[i]) == 1 and len(constr[j]) == 1:
-                            # it only makes sense to merge if both are single in their or list
-                            constr[j] = merge
-                            constr.pop(i)
-                            i -= 1
-                            breakUp = 4
-
-                        if breakUp > 0:
-                            breakUp -= 1
-                            break
-                        jj += 1
-                    if breakUp > 0:
-                        breakUp -= 1
-                        break
-                    ii += 1
-                if breakUp > 0:
-                    breakUp -= 1
+                if attrs[i].isdisjoint(attrs[j]):
+                    j += 1
+                    continue
+                outcome = self.__simplifyClauses(constr, attrs, i, j, valueOf)
+                if outcome == 'merge':
+                    # After a merge, we stop simplifying (the merged clause is no longer a simple AND term)
+                    return constr
+                elif outcome == 'i':
+                    # The clause at i was simplified away, so the next clause moved into i. Start it over.
                     break
-                j += 1
-            if breakUp > 0:
-                break
-            i += 1
+                elif outcome != 'j':
+                    # (if the clause at j was simplified away, the next clause moved into j and we compare it now)
+                    j += 1
+            else:
+                i += 1
         return constr
 
+    def __simplifyClauses(self, constr, attrs, i: int, j: int, valueOf) -> string:
+        '''
+        Simplifies the terms of OR clause i against the terms of OR clause j. Clauses (and the attribute sets in attrs)
+        are updated in place, as described in __constraintSimplification.
+        @param constr: the list of OR clauses
+        @param attrs: the set of attributes used by each clause in constr
+        @param i: the index of the first clause to compare
+        @param j: the index of the second clause to compare. It must come after i
+        @param valueOf: gives the numeric value of a term
+        @return 'i' or 'j' if that clause was simplified away and removed, 'merge' if clause i was merged into
+        clause j, otherwise None
+        '''
+        # We also want to iterate over every term (though typically there is only one)
+        # in the OR clause. We use ii as the iterator over terms in i, and jj for j.
+        ii = 0
+        while ii < len(constr[i]):
+            first = constr[i][ii]
+            jj = 0
+            while jj < len(constr[j]):
+                second = constr[j][jj]
+                # no simplification if the constraints are on different attributes
+                if first[0] != second[0]:
+                    jj += 1
+                    continue
+
+                # We can combine into BETWEEN if the operations are
+                #  opposite inclusive bounds that overlap (<= and >=)
+
+                # If the attributes do match, then we need to perform case analysis on the operators
+                # < and <= can be simplified by a lower < or <= or BETWEEN
+                # > and >= can be simplified by a higher > or >= or BETWEEN
+                # BETWEEN is a combination of both a >= and a <=
+                # != cannot be simplified, unless in the case of duplication
+                fVal = valueOf(first)
+                sVal = valueOf(second)
+
+                action = None
+                merge = None
+                if first[1] == '<' or first[1] == '<=':
+                    if second[1] == first[1]:
+                        action = fVal <= sVal
+                    # Check for a combination into BETWEEN
+                    elif first[1] == '<=' and second[1] == '>=' and fVal >= sVal:
+                        second[1] = 'BETWEEN'
+                        second.append(first[2])
+                        action = False
+                    elif second[1] == '>' or second[1] == '>=' and fVal <= sVal:
+                        # If we find contradictory requirements, we merge them into
+                        #  one OR clause.
+                        merge = [first, second]
+                elif first[1] == '>' or first[1] == '>=':
+                    if second[1] == first[1]:
+                        action = fVal >= sVal
+                    # Check (again) for a combination into BETWEEN
+                    elif first[1] == '>=' and second[1] == '<=' and fVal <= sVal:
+                        first[1] = 'BETWEEN'
+                        first.append(second[2])
+                        action = True
+                    elif second[1] == '<' or second[1] == '<=' and fVal >= sVal:
+                        merge = [second, first]
+                elif (first[1] == '=' or first[1] == '!=') and second[1] == first[1] and fVal == sVal:
+                    action = True
+                elif (first[1] == 'BETWEEN' or first[1] == 'NOT BETWEEN') and second[1] == first[1]:
+                    if fVal <= sVal and first[3] >= second[3]:
+                        action = True
+                    elif fVal >= sVal and first[3] <= second[3]:
+                        action = False
+
+                if action is not None:
+                    # reflect the temporaries back to their container
+                    constr[i][ii] = first
+                    constr[j][jj] = second
+                    # If some action is needed, we need to determine what we are going to do.
+                    # We want to delete from the option with more OR constrains.
+                    # True action means the values of the first remain, false indicates of the second
+                    if len(constr[i]) >= len(constr[j]):
+                        if action:  # if the first had the important info, copy it to the second
+                            constr[j][jj] = first
+                        # Delete the first
+                        constr[i].pop(ii)
+                        attrs[i] = set(term[0] for term in constr[i])
+                        if len(constr[i]) == 0:
+                            constr.pop(i)
+                            attrs.pop(i)
+                            return 'i'
+                        # the next term of i shifted into ii, so it is the next to compare
+                        break
+                    else:
+                        if not action:
+                            constr[i][ii] = second
+                        constr[j].pop(jj)
+                        attrs[j] = set(term[0] for term in constr[j])
+                        if len(constr[j]) == 0:
+                            # the whole OR clause was simplified away
+                            constr.pop(j)
+                            attrs.pop(j)
+                            return 'j'
+                        # the next term of j shifted into jj, so compare against it without advancing
+                        continue
+
+                if merge is not None and len(constr[i]) == 1 and len(constr[j]) == 1:
+                    # it only makes sense to merge if both are single in their or list
+                    constr[j] = merge
+                    attrs[j] = {first[0]}
+                    constr.pop(i)
+                    attrs.pop(i)
+                    return 'merge'
+                jj += 1
+            else:
+                ii += 1
+        return None
+
     def type3Where(self, typed: [[string, int]], table: database.Table) -> [string]:
         ret = []  # a list of SQL where clauses to return
         # We will want to find the unit attached to each type 3. It can be either before or after
         black = -1  # if we use a unit after the number, the unit cannot be reused for before the next number
+        # The walk from each value may look at any of the tokens, so we find which are numbers and bounds once
+        #  The walks read the tokens' values and types from flat lists, rather than from each token's pair.
+        values = [token[0] for token in typed]
+        types = [token[1] for token in typed]
+        numeric = [types[j] == 3 and isNumeric(values[j]) for j in range(len(typed))]
+        bounds = [self.operatorHandler.isBoundOperation(values[j]) if types[j] == 3 else None for j in range(len(typed))]
+
+        # The append operations used to create joint units (see below)
+        def backAppend(last: string, curr: string) -> string:
+            return curr + ' ' + last
+
+        def spaceAppend(last: string, curr: string) -> string:
+            return last + ' ' + curr
+
         for i in range(len(typed)):
             if i <= black:  # skip forward if this index is already blacklisted
                 continue
 
             token = typed[i]
-            if token[1] == 3 and isNumeric(token[0]):
+            if numeric[i]:
                 # We found a value! Now we need to find a corresponding unit.
                 # Also, we should look for a bounding operation (> >= < <=)
                 #  If no bounding operation is found, we assume equivalency
@@ -379,18 +548,13 @@ class ConstraintBuilder():
                 # Last thing to mention: we need two different append operations to create joint units.
                 #  Going backwards, we want it to be curr + space + last
                 #  Going forward, we want to have last + space + curr
-                def backAppend(last: string, curr: string) -> string:
-                    return curr + ' ' + last
-
-                def spaceAppend(last: string, curr: string) -> string:
-                    return last + ' ' + curr
-
+                #  (These are defined before the loop, since they do not depend on the value.)
                 directions = [[range(i - 1, black, -1), backAppend, -1], [range(i + 1, len(typed)), spaceAppend, 1]]
                 unitRange = [-1, -1]  # for a joint unit, the tokens have to be consecutive
                 for dirr in directions:
                     foundUnit = unit is not None
                     for j in dirr[0]:
-                        if typed[j][1] == 3 and self.operatorHandler.isBoundOperation(typed[j][0]):
+                        if bounds[j]:
                             if bound is not None:
                                 break  # cannot have two bounds!
                             # bounds each have a use direction.
@@ -398,9 +562,9 @@ class ConstraintBuilder():
                             #  '[,]' means the bound could be anywhere
                             #  no punctuation means the bound must be before the value
 
-                            if '[.]' in typed[j][0]:
+                            if '[.]' in values[j]:
                                 useCase = 0
-                            elif '[,]' in typed[j][0]:
+                            elif '[,]' in values[j]:
                                 useCase = 2
                             else:
                                 useCase = 1
@@ -409,37 +573,34 @@ class ConstraintBuilder():
                             if useCase == 1 and dirr[2] > 0:
                                 break  # if we are moving forward, we cannot see a starting bound
 
-                            bound = typed[j][0]
+                            bound = values[j]
 
-                            bb = self.operatorHandler.isBoundOperation(typed[j][0])
+                            bb = bounds[j]
                             rest = bound[len(bb):]
                             bound = bb
-                            if rest.find('(') != -1 and rest.find(')') != -1:
+                            inside = PARENS.search(rest)
+                            if inside is not None:
                                 # the unit is inside the bound
-                                start = rest.find('(') + 1
-                                end = rest.find(')')
-                                unit = rest[start:end]
+                                unit = inside.group(1)
                             if unit is not None:
                                 black = max(black, j)
                                 break  # don't need to go back more if we have the bound and the unit
-                        elif typed[j][1] == 3 and not isNumeric(typed[j][0]) and not foundUnit:
+                        elif types[j] == 3 and not numeric[j] and not foundUnit:
                             # We assume this is the unit. It is type 3, which is either a unit or a number.
                             #  It is not a number. Therefore, we assume it is the unit.
                             if unit is not None:  # we found another unit, and we already have a unit
                                 # It must be consecutive to be a joint unit. Otherwise, it is an unexpected token
                                 if unitRange[1] + dirr[2] == j:
-                                    unit = dirr[1](unit, typed[j][
-                                        0])  # create a joint unit by the direction's concat function
+                                    unit = dirr[1](unit, values[j])  # create a joint unit by the direction's concat function
                                     # making joint units is problematic since we don't know where to stop, but necessary for units
                                     # like "sq ft".
                                 else:
                                     break
                             else:
-                                unit = typed[j][0]
+                                unit = values[j]
                                 unitRange[0] = j
                             unitRange[1] = j  # update the end of the unit range to this
-                        elif (bound is None or bound == '!=') and typed[j][
-                            0] == '-' and j > i:  # we found a range indicator (though this can only come after and with no other bound)
+                        elif (bound is None or bound == '!=') and values[j] == '-' and j > i:  # we found a range indicator (though this can only come after and with no other bound)
                             backup = j
                             # If we find a range indicator, we need to do something special. Continue and find the next value,
                             #  and if the unit has not already been specified, the next unit. These are both used to build a new bound
@@ -450,11 +611,11 @@ class ConstraintBuilder():
                                     abort = True
 
                                 if not abort:
-                                    if typed[j][1] == 3:
-                                        if isNumeric(typed[j][0]):
-                                            otherVal = typed[j][0]
+                                    if types[j] == 3:
+                                        if numeric[j]:
+                                            otherVal = values[j]
                                         elif unit is None:  # sometimes the unit is given twice. If so, ignore
-                                            unit = typed[j][0]
+                                            unit = values[j]
                                     else:  # something unexpected!
                                         abort = True
 
@@ -467,8 +628,8 @@ class ConstraintBuilder():
                                     break
                             i = j
                             break  # After range computations, we don't want to stick around looking for more
-                        elif typed[j][1] == 2 and unit is None and self.isNumericColumnName(table.dat, typed[j][0]):
-                            unit = '_' + typed[j][0]
+                        elif types[j] == 2 and unit is None and values[j] in table.numericIndex:
+                            unit = '_' + values[j]
                             # We want to keep going since we might find a bound too
                         else:
                             break  # If we found something unexpected, we stop going backwards
@@ -492,26 +653,24 @@ class ConstraintBuilder():
                         cols.append(unit[1:])  # substring off the initial underscore
                     else:
                         # Find whether the unit exists in the table.
-                        for attr in table.dat:
-                            if len(attr) >= 3:  # if it has length three, then it is of the form: name, type, [units]
-                                # Therefore, we try to match the found unit to the unit here
-                                units = attr[2]
-                                for tUnit in units:
-                                    # Since we have joint units earlier, we have to accept the possibility that too much was amalgamated.
-                                    #  Therefore, the comparison must be "in" and not "==".
-                                    if (' ' + tUnit) in (' ' + unit):
-                                        # We don't have to match all the unit variations, only one
-                                        cols.append(attr[0][0])
-                                        # We want to see if any at the end was extra. If so, we may need to rewind the blacklist
-                                        if unitRange[1] == black:
+                        for attrName, units in table.unitAttrs:  # the attributes of the form: name, type, [units]
+                            # We try to match the found unit to the units here
+                            for tUnit in units:
+                                # Since we have joint units earlier, we have to accept the possibility that too much was amalgamated.
+                                #  Therefore, the comparison must be "in" and not "==".
+                                if (' ' + tUnit) in (' ' + unit):
+                                    # We don't have to match all the unit variations, only one
+                                    cols.append(attrName)
+                                    # We want to see if any at the end was extra. If so, we may need to rewind the blacklist
+                                    if unitRange[1] == black:
+                                        lastSpace = unit.rfind(' ')
+                                        trunc = unit[0:lastSpace]
+                                        while lastSpace != -1 and tUnit in trunc:
+                                            black -= 1  # rewind black once
+                                            unit = trunc
                                             lastSpace = unit.rfind(' ')
                                             trunc = unit[0:lastSpace]
-                                            while lastSpace != -1 and tUnit in trunc:
-                                                black -= 1  # rewind black once
-                                                unit = trunc
-                                                lastSpace = unit.rfind(' ')
-                                                trunc = unit[0:lastSpace]
-                                        break  # We found our match!
+                                    break  # We found our match!
                     # TODO: We want to find a way to resolve multiple conflicting matches. Right now we process all.
                     # Now that we found (all) column(s) matching the unit, we want to create the relation(s)
                     if len(cols) > 0:
@@ -520,10 +679,8 @@ class ConstraintBuilder():
 
                         # Also, if we have a range, we want to sort out which value is the lower, and which is the higher
                         value = token[0]
-                        if otherVal is not None:
-                            if float(otherVal) < float(value):
-                                value = otherVal
-                                otherVal = value
+                        if otherVal is not None and float(otherVal) < float(value):
+                            value, otherVal = otherVal, value
 
                         bb = '='  # equals is the assumed bounding operation.
                         if bound is not None:
@@ -552,31 +709,17 @@ class ConstraintBuilder():
         # Lastly, we are going to convert the arrays into a list of strings
         clauses = []
         for orList in ret:
-            where = ''
+            parts = []
             for constraint in orList:
-                if len(where) > 0:
-                    where += ' OR '
-
-                where += constraint[0]
                 if len(constraint) > 3:
-                    where += (' ' + constraint[1] + ' ' + constraint[2] + ' AND ' + constraint[3])
+                    parts.append(f'{constraint[0]} {constraint[1]} {constraint[2]} AND {constraint[3]}')
                 else:
-                    where += (' ' + constraint[1] + ' ' + constraint[2])
+                    parts.append(f'{constraint[0]} {constraint[1]} {constraint[2]}')
+            where = ' OR '.join(parts)
             if len(where) > 0:
                 clauses.append(where)
         return clauses
 
-    def isNumericColumnName(self, columns, name):
-        for col in columns:
-            if len(col) > 2:
-                # The column has to be greater than 2 to be numeric (since units are specified in the third column)
-                # In the first column, there are aliases. It just has to match one
-                # We also want to return the first in the series (the primary) if there is a match
-                for aliases in col[0]:
-                    if name == aliases:
-                        return col[0][0]
-        return None
-
     def orderBy(self, typed: [[string, int]], table: database.Table, type3: [string]) -> [string]:
         # Since we assume the query has already been standardized, we can go through quickly looking for superlative tokens
         ret = []
@@ -587,38 +730,22 @@ class ConstraintBuilder():
             if superlative:
                 # We have identified a superlative. By definition, we have an affected list
                 rest = token[0][len(superlative):]
-                start = rest.find('(') + 1
-                end = rest.find(')')
-                affected = rest[start:end].split(', ')
+                inside = PARENS.search(rest)
+                if inside is None:
+                    continue  # without an affected list, there is nothing to order by
+                affected = inside.group(1).split(', ')
 
                 # Now we need to find out how the affected applies in the context of our table
                 attrFound = None
                 for affect in affected:
                     if affect[0] == '_':  # This is indicative of a attribute value
-                        attrVal = affect[1:].lower()
-                        # We will search the table attribute names (and synonyms) to try to find a match
-                        for attr in table.dat:
-                            for name in attr[0]:
-                                if attrVal == name:
-                                    attrFound = attr[0][0]
-                                    break
-                            if attrFound is not None:
-                                break
-                        if attrFound is not None:
-                            break
+                        # We look up the table attribute names (and synonyms) to try to find a match
+                        attrFound = table.nameIndex.get(affect[1:].lower())
                     else:  # otherwise, we treat the affected like a unit
-                        unitVal = affect.lower()
-                        # We will search the table unit names to find a match
-                        for attr in table.dat:
-                            if len(attr) > 2:
-                                for unit in attr[2]:
-                                    if unitVal == unit:
-                                        attrFound = attr[0][0]
-                                        break
-                                if attrFound is not None:
-                                    break
-                        if attrFound is not None:
-                            break
+                        # We look up the table unit names to find a match
+                        attrFound = table.unitIndex.get(affect.lower())
+                    if attrFound is not None:
+                        break
 
                 # Lastly, we just need to find if it is ascending (<<) or descending (>>)
                 if superlative == "<<":
@@ -636,42 +763,54 @@ class ConstraintBuilder():
         #  It may not be as important as the explicit superlatives, but if the condition is not met, we should order partials.
 
         # We don't want to worry about more complex clauses that contain OR since our ordering assumption is not necessarily valid
+        # Index the constraints by the attributes they constrain, so that we only compare constraints that share one.
+        #  Parenthesized constraints are compound, and are not compared.
+        byAttr = dict()
+        for j in range(len(type3)):
+            other = type3[j]
+            if len(other) > 0 and other[0] != '(':
+                for attr in set(part.split(' ', 1)[0] for part in other.split(' OR ')):
+                    byAttr.setdefault(attr, []).append(j)
         for i in range(len(type3)):
             constr = type3[i]
             if 'OR' in constr:
                 continue
             # the attribute is always the first in the constraint (even for between)
-            comps = constr.split(' ')
-            if comps[0] in usedAttrs:
+            # (at most five parts are needed: attribute, operation, value, and for BETWEEN, AND and the upper value)
+            comps = constr.split(' ', 4)
+            attr = comps[0]
+            op = comps[1]
+            if attr in usedAttrs:
                 continue  # do not reuse any attribute
 
-            usedAttrs.append(comps[0])  # add it to used since we are analyzing it now
+            usedAttrs.append(attr)  # add it to used since we are analyzing it now
             # Look through all the other constraints to verify there aren't conflicting reqs
             ok = True
-            for j in range(i + 1, len(type3)):
+            for j in byAttr.get(attr, ()):
+                if j <= i:
+                    continue
                 other = type3[j]
-                if comps[0] in other and not (len(other) > 0 and other[0] == '('):
-                    # The other has valid form. We want to verify it does not conflict with this
-                    if comps[1] == '<' or comps[1] == '<=' and '<' in other:
-                        ok = True
-                    elif comps[1] == '>' or comps[1] == '>=' and '>' in other:
-                        ok = True
-                    else:  # otherwise, they are conflicting
-                        ok = False
-                        break
+                # The other has valid form. We want to verify it does not conflict with this
+                if op == '<' or op == '<=' and '<' in other:
+                    ok = True
+                elif op == '>' or op == '>=' and '>' in other:
+                    ok = True
+                else:  # otherwise, they are conflicting
+                    ok = False
+                    break
 
             # If no conflicting was found, we can use this for ordering partials
             if ok:
-                if '>' in comps[1]:
-                    ret.append(comps[0] + " DESC")
-                elif '<' in comps[1]:
-                    ret.append(comps[0] + " ASC")
-                elif '=' in comps[1] or 'BETWEEN' in comps[1]:
-                    if 'BETWEEN' in comps[1]:
+                if '>' in op:
+                    ret.append(attr + " DESC")
+                elif '<' in op:
+                    ret.append(attr + " ASC")
+                elif '=' in op or 'BETWEEN' in op:
+                    if 'BETWEEN' in op:
                         mean = (float(comps[2]) + float(comps[4])) / 2
                     else:
                         mean = comps[2]
-                    ret.append(f'ABS({mean} - {comps[0]})')
+                    ret.append(f'ABS({mean} - {attr})')
 
         return ret
 
@@ -682,32 +821,20 @@ class ConstraintBuilder():
         # NLTK will do most of the work for us, but we need to do some extra checks for hyphens.
         #  Sometimes hyphens are used to indicate ranges (fx $200-500), but it can also be used for model names (f-150)
         #  Some words are also just hyphenated, such as community-based, meat-fed, etc.
-        i = 0
-        inst = -1
-        while i < len(tokens):
-            # print(tokens[i])
-            inst = tokens[i].find('-', inst + 1)
-
-            if inst > -1:
-                # Analyze whether this is a range, or a name
-                #  We can distinguish if there is a letter on at least one side
-
-                # However,'K' cannot count for the left side, since it is often an abbreviation for thousand.
-                lettersButK = str(string.ascii_letters).replace('K', '')
-
-                if inst > 0 and inst + 1 < len(tokens[i]) and \
-                        not (tokens[i][inst - 1] in lettersButK or tokens[i][inst + 1] in string.ascii_letters):
-                    # Found an instance to separate!
-                    whole = tokens[i]
-                    tokens[i] = whole[0:inst]
-                    tokens.insert(i + 1, '-')
-                    tokens.insert(i + 2, whole[inst + 1:])
-                    i += 1  # since we want to skip the hyphen we just added
-                else:  # if it was not an instance to break, there may be more
-                    continue  # do not continue to next word (by skipping back to beginning of loop)
-            inst = -1  # reset to searching whole word
-            i += 1  # go to the next token
-        return tokens
+        # A hyphen is separated into its own token only if it is between two characters, neither of which is a letter
+        #  (though a K on the left is allowed, see RANGE_HYPHEN). The pieces around it are checked again, so a hyphen that begins a piece (as the second
+        #  of two hyphens would) is kept as part of that piece.
+        split = []
+        for token in tokens:
+            start = 0
+            for found in RANGE_HYPHEN.finditer(token):
+                if found.start() == start:
+                    continue  # the hyphen would begin the piece, so there is nothing on its left to separate
+                split.append(token[start:found.start()])
+                split.append('-')
+                start = found.end()
+            split.append(token[start:])
+        return split
 
     def correctSpelling(self, tokens, domain, table, correctSpell=True):
         from pathlib import Path
@@ -733,41 +860,30 @@ class ConstraintBuilder():
         if not correctSpell:
             return tokens
 
-        # To do so, we need to have a big dictionary with all three types of the correct domain
-        allWords = []
+        # To do so, we need to have a big dictionary with all three types of the correct domain.
+        #  The spelling corrector only checks whether a word is known (never how often it appears), so each word
+        #  is entered once, in the order it was first seen.
         # Add universal words from a dictionary
-
         engDict = open(str(Path(__file__).parent) + "/Datasets/dictionary_eng_80k.txt", encoding='utf-8')
-        for line in engDict:
-            word, _ = line.split(" ")
-            allWords.append(word)
-        engDict.close()
+        universal = (line.split(" ")[0] for line in engDict)
 
         # There are also domain-specific words we will enter
+        attrWords = []
         for attr in table.dat:  # from the table titles
-            for typeSynonym in attr[0]:
-                allWords.append(typeSynonym)
+            attrWords.extend(attr[0])
             if len(attr) > 2:
-                for unit in attr[2]:
-                    allWords.append(unit)
+                attrWords.extend(attr[2])
         trieList = self.extractor.verifier.getDomainTries(domain)
-        for trie in trieList:  # from the dataset instances
-            for word in trie.wordSet:
-                allWords.append(word.lower())
+        trieWords = (word for trie in trieList for word in trie.lower_words())  # from the dataset instances
+
+        words_dict = dict.fromkeys(chain(universal, attrWords, trieWords), 1)
+        engDict.close()
         # Now we can actually perform the spelling corrections (if any)
         from src.trie.symspell import spell_corrector
-        words_dict = {}
-        for word in allWords:
-            if word in words_dict:
-                words_dict[word] += 1
-            else:
-                words_dict[word] = 1
-
         return spell_corrector(tokens, words_dict, self.abbrevToExpand)
 
     def extractOperated(self, typed, table, domain):
-        result = OperatorEvaluator(typed[:], lambda x: self.operatorHandler.isBoundOperation(
-            x) or self.operatorHandler.isSuperlative(x)).result
+        result = OperatorEvaluator(typed[:], self.operatorHandler.matchOperation).result
 
         # Now we need to read through the structure and work on the subparts
         # Essentially, we are trying to flatten it.
@@ -843,9 +959,9 @@ class ConstraintBuilder():
 
                 # process the tokens and add them to their respective lists, then clear the pending list
                 if len(pending) > 0:
-                    typesWhere[0] += self.type1Where(pending, table)
-                    typesWhere[1] += self.type2Where(pending, table, domain)
-                    typesWhere[2] += self.type3Where(pending, table)
+                    typesWhere[0] += self.__cachedWhere(self.type1Where, pending, table)
+                    typesWhere[1] += self.__cachedWhere(self.type2Where, pending, table, domain)
+                    typesWhere[2] += self.__cachedWhere(self.type3Where, pending, table)
                     pending.clear()
 
             i = 0
@@ -877,19 +993,8 @@ class ConstraintBuilder():
         if len(classified) == 0:
             raise Exception("The query could not be classified!")
         classified = classified[0]
-        if classified == "car":
-            domain = Domain.CAR
-        elif classified == "furniture":
-            domain = Domain.FURNITURE
-        elif classified == "housing":
-            domain = Domain.HOUSING
-        elif classified == "jewelry":
-            domain = Domain.JEWELRY
-        elif classified == "computer science jobs":
-            domain = Domain.JOB
-        elif classified == "motorcycles":
-            domain = Domain.MOTORCYCLE
-        else:
+        domain = CLASSIFIED_DOMAINS.get(classified)
+        if domain is None:
             raise Exception(
                 "The classification of the query did not match any of the expected domains! Got: " + classified)
         table = database.getTable(domain)
@@ -900,7 +1005,7 @@ class ConstraintBuilder():
         # and then correct any misspellings
         log("Correcting spelling...")
         tokens = self.correctSpelling(tokens, domain, table, correctSpelling)
-        print('"' + " ".join(tokens) + '"')
+        log(lambda: '"' + " ".join(tokens) + '"')
 
         # now we want to pull some data out (Type I, II, III)
         typed = self.extractor.typify(tokens, domain)
@@ -1093,9 +1198,13 @@ if __name__ == '__main__':
     if limit == -1 and not exactOnly:
         limit = 25
 
+    # log prints any number of values on one line. A value that is costly to build may be given as a callable
+    #  instead, which is only called if logging is on.
     if toLog:
         def log(*args):
             for a in args:
+                if callable(a):
+                    a = a()
                 print(a, end=' ')
             print()
     else:
@@ -1,6 +1,12 @@
 import string
+import threading
 from src.domains import Domain
 
+# LIKE only ignores the case of ASCII letters, so this is the lowering used when we compare cells ourselves
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+# The open connection of each thread that has used the database (see connection)
+threadConnections = threading.local()
+
 class Table(object):
     def __init__(self, name:Domain, primKey:int, idxCol:[int], *args):
         '''
@@ -14,6 +20,27 @@ class Table(object):
         self.primKey = primKey
         self.idxCol = idxCol
         self.dat = args
+        # The primary name of each attribute, by its column index
+        self.colNames = [attr[0][0] for attr in args]
+        # Lookups over the attribute names and units, so that they need not be found by scanning dat.
+        #  When a name or unit is shared, the first attribute (in order) that has it is kept.
+        self.nameIndex = dict() # any name of an attribute -> the primary name of that attribute
+        self.numericIndex = dict() # the same, but only for the attributes that have units
+        self.unitIndex = dict() # a unit -> the primary name of the first attribute that uses it
+        self.unitAttrs = [] # [primary name, units] of each attribute that has units, in order
+        for attr in args:
+            for name in attr[0]:
+                self.nameIndex.setdefault(name, attr[0][0])
+            if len(attr) > 2:
+                self.unitAttrs.append([attr[0][0], attr[2]])
+                for name in attr[0]:
+                    self.numericIndex.setdefault(name, attr[0][0])
+                for unit in attr[2]:
+                    self.unitIndex.setdefault(unit, attr[0][0])
+        # The text cells of each column, as read by loadColumn, and the index of the words in those
+        #  cells (see getWordIndex). Both are built the first time the column is searched
+        self.columns = dict()
+        self.wordIndexes = dict()
 
 
 motorcycles = Table(Domain.MOTORCYCLE, None, [0],
@@ -112,18 +139,30 @@ cars = Table(Domain.CAR, 0, [4, 5], # both the make and the model are type 1
     [["state"], "TEXT"]
 )
 
-def execute(sqlCmd:string):
-    import sqlite3
-    from pathlib import Path
-    con = sqlite3.connect(str(Path(__file__).parent) + "/../product_qa.db")
-    cur = con.cursor()
-    result = cur.execute(sqlCmd)
+def connection():
+    '''
+    Gets the calling thread's connection to the database, opening it the first time the thread needs it.
+    Keeping the connection open means the file is not reopened for every command, and SQLite can reuse the
+    statements it already compiled (such as the parameterized probes) rather than parsing them again.
+    A connection cannot be shared between threads, so each thread has its own.
+    @return the connection for this thread
+    '''
+    if not hasattr(threadConnections, 'con'):
+        import sqlite3
+        from pathlib import Path
+        threadConnections.con = sqlite3.connect(str(Path(__file__).parent) + "/../product_qa.db")
+    return threadConnections.con
+
+
+def execute(sqlCmd:string, params=()):
+    cur = connection().cursor()
+    result = cur.execute(sqlCmd, params)
     ls = list(result)
-    con.close()
+    cur.close()
     return ls
 
 
-def query(table:Table, attrList:[int], where:string):
+def query(table:Table, attrList:[int], where:string, params=()):
     cmd = "SELECT "
     # Here we need to build the list of attribute names
     first = True
@@ -132,13 +171,116 @@ def query(table:Table, attrList:[int], where:string):
             first = False
         else:
             cmd += ", "
-        cmd += table.dat[attr][0][0]
+        cmd += table.colNames[attr]
     if attrList == []:
         cmd += "*"
     
     cmd += " FROM " + table.name.value + " WHERE " + where + ";"
     #print(cmd)
-    return execute(cmd)
+    return execute(cmd, params)
+
+
+def exists(table:Table, wheres:[string], params=()) -> [bool]:
+    '''
+    Checks several conditions against the table in a single statement.
+    @param table: the table to check the conditions against
+    @param wheres: the where clauses to check. Each is checked independently of the others
+    @param params: the values to bind to the ? placeholders of the where clauses, in order
+    @return a list parallel to wheres, where each entry is whether some row satisfies that where clause
+    '''
+    if len(wheres) == 0:
+        return []
+    # Each condition becomes its own EXISTS column, so SQLite can stop scanning for one as soon as it is satisfied
+    cmd = "SELECT "
+    first = True
+    for where in wheres:
+        if first:
+            first = False
+        else:
+            cmd += ", "
+        cmd += "EXISTS(SELECT 1 FROM " + table.name.value + " WHERE " + where + ")"
+    cmd += ";"
+    row = execute(cmd, params)[0]
+    return [bool(found) for found in row]
+
+
+def maxLength(table:Table, attr:int) -> int:
+    '''
+    Finds the length of the longest text value stored in the column. The length is taken from the cells read
+    by loadColumn (lowering them does not change their lengths), so the column is not scanned again for it.
+    Only text cells are counted, since they are the only ones a whole-word pattern can match.
+    @param table: the table to search
+    @param attr: the index of the column to search in
+    @return the length of the longest value, or 0 if the column has no text values
+    '''
+    return max(map(len, loadColumn(table, attr)), default=0)
+
+
+def loadColumn(table:Table, attr:int) -> [string]:
+    '''
+    Gets the text cells of the column, reading them the first time they are requested. The cells are
+    lowered the same way LIKE compares them, so they can be searched without going through SQL.
+    Cells that are not text are left out: they never contain spaces, so no whole-word pattern matches them.
+    @param table: the table the column is in
+    @param attr: the index of the column
+    @return the lowered cells of the column
+    '''
+    if attr not in table.columns:
+        cells = []
+        for row in execute("SELECT " + table.colNames[attr] + " FROM " + table.name.value + ";"):
+            if isinstance(row[0], str):
+                cells.append(row[0].translate(ASCII_LOWER))
+        table.columns[attr] = cells
+    return table.columns[attr]
+
+
+def getWordIndex(table:Table, attr:int) -> {string: {int}}:
+    '''
+    Gets the inverted index of the column, building it the first time it is requested. It maps each word
+    to the cells (by their position in loadColumn) that have that word with a space on both sides of it,
+    which is what a whole-word LIKE pattern needs. Since the patterns only look for spaces, the cells are
+    split on spaces only.
+    @param table: the table the column is in
+    @param attr: the index of the column
+    @return the index of the (lowered) words in that column
+    '''
+    if attr not in table.wordIndexes:
+        index = dict()
+        for row, cell in enumerate(loadColumn(table, attr)):
+            # The first and last pieces have no space on their outer side, so no pattern could match them there
+            for word in cell.split(' ')[1:-1]:
+                index.setdefault(word, set()).add(row)
+        table.wordIndexes[attr] = index
+    return table.wordIndexes[attr]
+
+
+def contains(table:Table, attr:int, value:string) -> bool:
+    '''
+    Checks whether some cell of the column has the value as a whole-word substring. This gives the same
+    answer as `attr LIKE "% value %"`, as long as the value has no LIKE wildcards (_ or %) in it.
+    @param table: the table to search
+    @param attr: the index of the column to search in
+    @param value: the value to search for
+    @return whether there was at least one match
+    '''
+    index = getWordIndex(table, attr)
+    words = value.translate(ASCII_LOWER).split(' ')
+    if len(words) == 1:
+        return words[0] in index
+    # Only the cells that have every word of the value could have the whole value
+    rows = None
+    for word in words:
+        if word not in index:
+            return False
+        rows = index[word] if rows is None else rows & index[word]
+        if len(rows) == 0:
+            return False
+    pattern = " " + " ".join(words) + " "
+    cells = loadColumn(table, attr)
+    for row in rows:
+        if pattern in cells[row]:
+            return True
+    return False
 
 
 def getTable(domain:Domain) -> Table:
@@ -220,6 +220,22 @@ class NotRelation(OperatorRelation):
 
 
 
+class OptionNode():
+    '''
+    A node in the token trie built over the synonym options. Each edge is one component of an option
+    (a word, the wildcard '*', an application such as '(1)', or a use indicator).
+    '''
+    
+    def __init__(self):
+        self.next = dict()
+        # The (component, child, application code) edges that may be handled other than as a plain word:
+        #  applications, use indicators, and the wildcard. Every other edge is only ever followed by its word.
+        #  The application code is the component without its parentheses, or None if it is not an application.
+        self.special = []
+        # The [order, symbol] of the first option (in file order) that ends at this node, if any
+        self.end = None
+
+
 class OperatorHandler():
     import string
     def __init__(self):
@@ -227,55 +243,103 @@ class OperatorHandler():
         #  and superlative words.
         self.bounders, self.boundApps = self.__loadSynonymFile("boundary-synonyms")
         self.superlatives, self.superApps = self.__loadSynonymFile("superlatives-synonyms")
+        
+        # Standardization tries to match the synonym options at each position of the query. We build
+        #  a trie over the components of all the options so that options sharing a prefix are matched
+        #  together in one walk.
+        self.boundTrie = self.__buildTrie(self.bounders)
+        self.superTrie = self.__buildTrie(self.superlatives)
+        
+        # Every operation symbol, mapped to the kind of operation it is
+        self.opKinds = dict()
+        for bounder in self.bounders:
+            self.opKinds[bounder[0]] = 'bound'
+        for superlative in self.superlatives:
+            self.opKinds[superlative[0]] = 'super'
     
     
     def __loadSynonymFile(self, fileName:string):
         from pathlib import Path
-        synFile = open(str(Path(__file__).parent) + "/../" + fileName + ".txt", encoding='utf-8')
         synList = []
         appDict = None
         currBound = []
         currSym = None
-        for line in synFile:
-            if appDict is None:
-                line = line[0:-1] # to remove the trailing new line
-                if len(line) == 0:
-                    if len(currBound) > 0:
-                        synList.append([currSym, currBound])
-                        currBound = []
-                    currSym = None
-                else:
-                    if line[0] == '-': # The dash barrier marks the end of the boundary synonyms
-                        appDict = {}
-                    elif currSym is None: # the new symbol is set
-                        currSym = line
+        with open(str(Path(__file__).parent) + "/../" + fileName + ".txt", encoding='utf-8') as synFile:
+            for line in synFile:
+                line = line.rstrip('\n') # to remove the trailing new line (the last line may not have one)
+                if appDict is None:
+                    if len(line) == 0:
+                        if len(currBound) > 0:
+                            synList.append((currSym, tuple(currBound)))
+                            currBound = []
+                        currSym = None
                     else:
-                        currBound.append(line)
-            else:
-                # For applications. These are definitions of parenthesized numbers (which are used by boundary synonyms)
-                firstEnd = line.find(' ')
-                # The first token is the application defined
-                defed = line[0:firstEnd]
-                # All other tokens ought to be separated by ;
-                split = line[firstEnd+1:-1].split('; ')
-                appDict.update({defed: split})
+                        if line[0] == '-': # The dash barrier marks the end of the boundary synonyms
+                            appDict = {}
+                        elif currSym is None: # the new symbol is set
+                            currSym = line
+                        else: # each option is kept as the tuple of its space-separated components
+                            currBound.append(tuple(line.split(' ')))
+                else:
+                    # For applications. These are definitions of parenthesized numbers (which are used by boundary synonyms)
+                    firstEnd = line.find(' ')
+                    # The first token is the application defined
+                    defed = line[0:firstEnd]
+                    # All other tokens ought to be separated by ;
+                    split = line[firstEnd+1:].split('; ')
+                    appDict.update({defed: split})
         if len(currBound) > 0:
-            synList.append([currSym, currBound])
-        synFile.close()
+            synList.append((currSym, tuple(currBound)))
         
         return synList, appDict
     
     
-    def isOperation(self, opSet, x:string) -> bool:
-        for operation in opSet:
-            sym = operation[0]
-            # if the bounding symbol is the first in the string, then we know it is a bounding operation
-            if x.find(sym) == 0 and (len(x) == len(sym) or x[len(sym)]==' '): 
-                return sym
+    def __buildTrie(self, synList) -> OptionNode:
+        '''
+        Creates a trie over the components of every synonym option.
+        @param synList: the synonym list, as loaded from the synonym file (each option a tuple of its components)
+        @return the root of the trie. Each option's end node remembers its symbol and its order in the file.
+        '''
+        root = OptionNode()
+        order = 0
+        for syn in synList:
+            for option in syn[1]:
+                node = root
+                for comp in option:
+                    if comp not in node.next:
+                        node.next[comp] = OptionNode()
+                        if comp[0] == '(' and comp[-1] == ')':
+                            node.special.append((comp, node.next[comp], comp[1:-1]))
+                        elif comp == ',' or comp == '.' or comp == '*':
+                            node.special.append((comp, node.next[comp], None))
+                    node = node.next[comp]
+                if node.end is None: # an option given twice keeps its first position
+                    node.end = [order, syn[0]]
+                order += 1
+        return root
+    
+    
+    def matchOperation(self, x:string) -> [string, string]:
+        '''
+        Finds the operation that the token begins with, if any.
+        @param x: the token to check
+        @return the operation symbol and its kind ('bound' or 'super'), or None if the token is not an operation
+        '''
+        # The symbol must be the first in the string, followed by either nothing or a space. Therefore,
+        #  it is the first space-separated component, which we can look up directly.
+        sym = x.split(' ', 1)[0]
+        if sym in self.opKinds:
+            return [sym, self.opKinds[sym]]
         return None
     
     def isBoundOperation(self, x:string) -> bool:
-        return self.isOperation(self.bounders, x)
+        op = self.matchOperation(x)
+        if op is not None and op[1] == 'bound':
+            return op[0]
+        return None
     
     def isSuperlative(self, x:string) -> bool:
-        return self.isOperation(self.superlatives, x)
+        op = self.matchOperation(x)
+        if op is not None and op[1] == 'super':
+            return op[0]
+        return None
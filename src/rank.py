@@ -25,6 +25,14 @@ class RelevanceRanker(object):
             self.attr = attr
             self.operation = operation
             self.vals = vals
+            # The numeric form of each value. Every row is scored against the same unit, so each
+            #  value is parsed only the first time it is needed (text values are never parsed).
+            self.nums = [None] * len(vals)
+        
+        def number(self, k) -> float:
+            if self.nums[k] is None:
+                self.nums[k] = float(self.vals[k])
+            return self.nums[k]
     
     
     def __parseGroup(self, req): # returns a Unit or Operation composed of units
@@ -179,7 +187,7 @@ class RelevanceRanker(object):
             else:
                 # All other operations use numbers
                 act = float(value)
-                exp = float(comp.vals[0])
+                exp = comp.number(0)
                 # Find the divisor, which will effectively determine how much the difference between actual and
                 #  expected should be penalized. Years are an interesting attribute, because for cars, motorcycles,
                 #  and some other products, they are closer to a Type II than a Type III in that the exact year
@@ -213,7 +221,7 @@ class RelevanceRanker(object):
                     distance = act - exp
                 elif comp.operation == 'BETWEEN':
                     lo = exp
-                    hi = float(comp.vals[1])
+                    hi = comp.number(1)
                     exp = (lo + hi) / 2
                     if act >= lo and act <= hi:
                         return 1
@@ -278,7 +286,7 @@ class RelevanceRanker(object):
             else:
                 # All other operations use numbers
                 act = float(value)
-                exp = float(comp.vals[0])
+                exp = comp.number(0)
                 # Find the divisor, which will effectively determine how much the difference between actual and
                 #  expected should be penalized. Years are an interesting attribute, because for cars, motorcycles,
                 #  and some other products, they are closer to a Type II than a Type III in that the exact year
@@ -310,7 +318,7 @@ class RelevanceRanker(object):
                         return 1  # This is where we would calculate extra credit score
                 elif comp.operation == 'BETWEEN':
                     lo = exp
-                    hi = float(comp.vals[1])
+                    hi = comp.number(1)
                     exp = (lo + hi) / 2
                     if act >= lo and act <= hi:
                         return 1
@@ -372,7 +380,7 @@ class RelevanceRanker(object):
             else:
                 # All other operations use numbers
                 act = float(value)
-                exp = float(comp.vals[0])
+                exp = comp.number(0)
                 # Find the divisor, which will effectively determine how much the difference between actual and
                 #  expected should be penalized. Years are an interesting attribute, because for cars, motorcycles,
                 #  and some other products, they are closer to a Type II than a Type III in that the exact year
@@ -404,7 +412,7 @@ class RelevanceRanker(object):
                         return 1  # This is where we would calculate extra credit score
                 elif comp.operation == 'BETWEEN':
                     lo = exp
-                    hi = float(comp.vals[1])
+                    hi = comp.number(1)
                     exp = (lo + hi) / 2
                     if act >= lo and act <= hi:
                         return 1
@@ -480,7 +488,7 @@ class RelevanceRanker(object):
             else:
                 # All other operations use numbers
                 act = float(value)
-                exp = float(comp.vals[0])
+                exp = comp.number(0)
                 # Find the divisor, which will effectively determine how much the difference between actual and
                 #  expected should be penalized. Years are an interesting attribute, because for cars, motorcycles,
                 #  and some other products, they are closer to a Type II than a Type III in that the exact year
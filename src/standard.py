@@ -1,160 +1,134 @@
 
 class Standardizer(object):
+    
+    # The operation that results from negating each bound or superlative operation
+    NEGATIONS = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '<<': '>>', '>>': '<<'}
 
     def __init__(self, operatorHandler):
         self.operatorHandler = operatorHandler
     
     
     import string
-    def standardizeQuery(self, typed:[[string, int]]) -> [[string, int]]:
-        # Go through each of the bounders and try to match them to tokens in the query
-        for bounder in self.operatorHandler.bounders:
-            sym = bounder[0]
-            for option in bounder[1]:
-                # For each option that maps to the given symbol
-                #  We will want to break each option into component tokens
-                comps = option.split(' ')
-                changes = True # we will cycle through the typified query tokens until no changes can be made
-                while changes:
-                    changes = False
-                    unit = '' # the units found
-                    useIndicator = '' # if this must come at the end (.), or can be end or beginning (,)
-                    i = 0 # the current component index to match with
-                    start = 0
-                    end = -1
-                    for j in range(len(typed)):
-                        token = typed[j]
-                        reset = False
-                        # we can only consider the token for boundary if it is a type 4
-                        # or optionally we can have a unit if we are looking for one
-                        if token[1] == 4 or (token[1] == 3 and comps[i] == '*'):
-                            # Now we try to make a match
-                            if comps[i] == '*':
-                                if token[1] != 3 and token[0].lower() == comps[i+1]:
-                                    i += 2 # match, now move on to next
-                                else:
-                                    # otherwise, save the unit we found
-                                    if len(unit) > 0:
-                                        unit += ' '
-                                    unit += token[0].lower()
-                            elif comps[i] == token[0].lower(): # we need an exact match
-                                i += 1 # go to the next component to match
-                                
-                                # Check for an application next or use indicator (',' or '.')
-                                if i < len(comps):
-                                    if comps[i][0] == '(' and comps[i][-1] == ')':
-                                        # we found an application. This should be saved, but then skipped over
-                                        if len(unit) > 0:
-                                            unit += ' '
-                                        
-                                        appCode = comps[i][1:-1]
-                                        if appCode in self.operatorHandler.boundApps:
-                                            # match of application definition
-                                            if len(unit) > 0:
-                                                unit += ' '
-                                            unit += ' '.join(self.operatorHandler.boundApps[appCode])
-                                        i += 1 # move on, since we don't actually match against an application
-                                    elif len(comps[i]) == 1 and (comps[i] == ',' or comps[i] == '.'):
-                                        useIndicator = comps[i]
-                                        i += 1 # move on, since we don't match on the use indicator
-                            else:
-                                reset = True
-                            
-                            # Now verify that i is within correct bounds
-                            if i >= len(comps):
-                                # We have a complete match!
-                                end = j
-                                break
+    def __matchOptions(self, trie, apps:{string: [string]}, typed:[[string, int]], start:int, bounding:bool):
+        '''
+        Matches all the synonym options in the trie against the query tokens beginning at start.
+        Options are made of words, which must match type 4 tokens exactly. A word may be followed by an
+        application, which is saved but not matched against any token. When bounding, a word may instead be
+        followed by a use indicator (',' or '.'), and an option may contain the wildcard '*', which collects
+        the unit from all tokens until the word after it.
+        @param trie: the root of the option trie to match with
+        @param apps: the application definitions for the options
+        @param typed: the typified query tokens
+        @param start: the index of the token that should match the first component
+        @param bounding: whether the options are bounders (rather than superlatives)
+        @return a list of the options matched, in the order they are given in the file. Each match is a list of the
+                symbol, the index of the last token matched, the units (or affected) found, and the use indicator.
+        '''
+        matches = []
+        # Each pending state holds: the trie node reached, the index of the next token, the units found,
+        #  the use indicator, and how the node was reached ('word', 'wild' inside a wildcard, or None).
+        pending = [[trie, start, [], '', None]]
+        while len(pending) > 0:
+            node, j, units, useIndicator, how = pending.pop()
+            if node.end is not None and j > start:
+                # We have a complete match!
+                found = ' '.join(units) if bounding else ''.join(units)
+                matches.append([node.end[0], node.end[1], j - 1, found, useIndicator])
+            
+            if how == 'wild':
+                # Inside the wildcard, everything is part of the unit until we find the word after it
+                if j < len(typed):
+                    value, typeNum = typed[j]
+                    value = value.lower()
+                    if typeNum == 4 and value in node.next:
+                        pending.append([node.next[value], j + 1, units, useIndicator, None])
+                    elif typeNum == 3 or typeNum == 4:
+                        pending.append([node, j + 1, units + [value], useIndicator, 'wild'])
+                continue
+            
+            # The components that are not plain words are checked one by one. Any that is not used specially
+            #  here may still be matched as a word below.
+            used = []
+            for comp, child, appCode in node.special:
+                if how == 'word' and appCode is not None:
+                    # we found an application after a word. This should be saved, but then skipped over
+                    if appCode in apps:
+                        if bounding:
+                            found = units + apps[appCode]
                         else:
-                            reset = True # reset any progress since all tokens in the pattern must be consecutive
-                        if reset:
-                            i = 0 # reset any progress we have made
-                            start = j+1 # this is potentially where the pattern begins
-                    
-                    # If we made it out of the token loop, we want to see if the range finished
-                    if end != -1:
-                        # It did. Now we make the replacement
-                        value = sym
-                        if len(unit) > 0:
-                            value += " (" + unit + ")"
-                        if len(useIndicator) > 0:
-                            value += ' [' + useIndicator + ']'
-                        typed = typed[0:start] + [[value, 3]] + typed[end+1:]
-                        changes = True
+                            found = [', '.join(apps[appCode])]
+                    else:
+                        found = units
+                    pending.append([child, j, found, useIndicator, None])
+                elif how == 'word' and bounding and (comp == ',' or comp == '.'):
+                    # a use indicator after a word is saved, but also not matched against any token
+                    pending.append([child, j, units, comp, None])
+                elif bounding and comp == '*':
+                    pending.append([child, j, units, useIndicator, 'wild'])
+                else:
+                    continue
+                used.append(comp)
+            # Any other component must match the next token exactly, so the token's word leads to the only child
+            #  that could match, and there is no need to compare it against every component.
+            if j < len(typed) and typed[j][1] == 4:
+                word = typed[j][0].lower()
+                if word in node.next and word not in used:
+                    pending.append([node.next[word], j + 1, units, useIndicator, 'word'])
+        
+        matches.sort()
+        return [match[1:] for match in matches]
+    
+    
+    def standardizeQuery(self, typed:[[string, int]]) -> [[string, int]]:
+        # Go through the tokens in the query and try to match them to the start of some bounder.
+        #  All the options are matched together by walking the trie built over them.
+        # A replacement never creates a new starting word before itself, so one sweep from left to right
+        #  finds every match.
+        start = 0
+        while start < len(typed):
+            matches = self.__matchOptions(self.operatorHandler.boundTrie, self.operatorHandler.boundApps, typed, start, True)
+            if len(matches) > 0:
+                # It did. Now we make the replacement. We only use the first option that matches
+                sym, end, unit, useIndicator = matches[0]
+                value = sym
+                if len(unit) > 0:
+                    value += " (" + unit + ")"
+                if len(useIndicator) > 0:
+                    value += ' [' + useIndicator + ']'
+                typed[start:end+1] = [[value, 3]] # splice the replacement in place
+            start += 1
         
         # Check to see if the tokens match with superlatives. This algorithm closely resembles for bounding.
         #  A superlative will match one of the synonyms and will either be followed by (or preceded by) a Type II attribute or a Type III unit
-        for superlative in self.operatorHandler.superlatives:
-            sym = superlative[0]
-            for option in superlative[1]:
-                # For each option that maps to the given symbol, we look in the query for potential matches
-                #  each match option can contain multiple tokens, which we need to break into component parts
-                comps = option.split(' ')
-                changes = True # we will cycle through the typified query tokens until no changes can be made
-                while changes:
-                    changes = False
-                    affected = '' # the unit or attribute that is being affected
-                    i = 0 # the current component index to match with
-                    start = 0
-                    end = -1
-                    for j in range(len(typed)):
-                        token = typed[j]
-                        reset = False
-                        # We only consider the token to match the superlative if it is type 4.
-                        if token[1] == 4:
-                            if comps[i] == token[0].lower(): # we need an exact match
-                                i += 1 # go to the next component to match
-                                
-                                # Check for an application
-                                if i < len(comps) and comps[i][0] == '(' and comps[i][-1] == ')':
-                                    # we found an application. This should be saved, but then skipped over
-                                    appCode = comps[i][1:-1]
-                                    if appCode in self.operatorHandler.superApps:
-                                        # match of application definition
-                                        affected = ', '.join(self.operatorHandler.superApps[appCode])
-                                    i += 1 # move on, since we don't actually match against an application
-                            else:
-                                reset = True
-                            
-                            # Now verify that i is within correct bounds
-                            if i >= len(comps):
-                                # We have a complete match!
-                                end = j
-                                break
-                        else:
-                            reset = True # reset any progress since all tokens in the pattern must be consecutive
-                        if reset:
-                            i = 0 # reset any progress we have made
-                            start = j+1 # this is potentially where the pattern begins
-                    
-                    # If we made it out of the token loop, we want to see if the range finished
-                    if end != -1:
-                        # It did. Now we make the replacement
-                        value = sym
-                        if len(affected) == 0:
-                            # If no affected was built-in to the superlative, we need to go find it
-                            #  If it exists, it will either be immediately after or before the superlative
-                            if end+1 <= len(typed):
-                                if typed[end+1][1] == 2:
-                                    # Mark Type II affected with a leading underscore
-                                    affected = "_" + typed[end+1][0]
-                                    end += 1
-                                elif typed[end+1][1] == 3:
-                                    affected = typed[end+1][0]
-                                    end += 1
-                            if len(affected) == 0 and start > 0 and typed[start-1][1] == 2:
-                                affected = "_" + typed[start-1][0]
-                                start -= 1
-                        
-                        # Now append the affected
-                        if len(affected) > 0:
-                            value += " (" + affected + ")"
-                        else:
-                            # If we could not find an effected, then throw out this superlative!
-                            break
-                        # Lastly, reflect the changes in the query
-                        typed = typed[0:start] + [[value, 4]] + typed[end+1:]
-                        changes = True
+        start = 0
+        while start < len(typed):
+            matches = self.__matchOptions(self.operatorHandler.superTrie, self.operatorHandler.superApps, typed, start, False)
+            for sym, end, affected, _ in matches:
+                value = sym
+                if len(affected) == 0:
+                    # If no affected was built-in to the superlative, we need to go find it
+                    #  If it exists, it will either be immediately after or before the superlative
+                    if end+1 < len(typed):
+                        if typed[end+1][1] == 2:
+                            # Mark Type II affected with a leading underscore
+                            affected = "_" + typed[end+1][0]
+                            end += 1
+                        elif typed[end+1][1] == 3:
+                            affected = typed[end+1][0]
+                            end += 1
+                    if len(affected) == 0 and start > 0 and typed[start-1][1] == 2:
+                        affected = "_" + typed[start-1][0]
+                        start -= 1
+                
+                # Now append the affected
+                if len(affected) == 0:
+                    # If we could not find an effected, then throw out this superlative!
+                    continue
+                value += " (" + affected + ")"
+                # Lastly, reflect the changes in the query
+                typed[start:end+1] = [[value, 4]] # splice the replacement in place
+                break
+            start += 1
         
         # There are just a few different phrases for ranges:
         #  Between * (and/to/-) *
@@ -167,12 +141,13 @@ class Standardizer(object):
         i = 0
         while i < len(typed):
             token = typed[i]
-            if token[0].lower() == 'between' or token[0].lower() == 'from':
-                rangeType = token[0].lower()
+            word = token[0].lower()
+            if word == 'between' or word == 'from':
+                rangeType = word
                 delIndex = i
             
             elif rangeType is not None:
-                if token[0].lower() == 'to' or (rangeType == 'between' and token[0].lower() == 'and'):
+                if word == 'to' or (rangeType == 'between' and word == 'and'):
                     token[0] = '-' # transform to a simple hyphen, maintaining type
                     typed.pop(delIndex) # we delete the starting range word (since it can interfere with finding "not")
                     i -= 1
@@ -200,30 +175,16 @@ class Standardizer(object):
                         typed.pop(i)
                         continue
                     
-                    isBound = self.operatorHandler.isBoundOperation(nxt)
-                    isSuper = self.operatorHandler.isSuperlative(nxt)
-                    isOp = isBound if isBound is not None else isSuper
-                    if isOp is not None:
+                    op = self.operatorHandler.matchOperation(nxt)
+                    if op is not None:
+                        isOp = op[0]
                         excess = nxt.rfind('(')
                         if excess != -1:
                             excess = nxt[excess:]
                         else:
                             excess = ""
                         
-                        result = None
-                        if isOp == '<':
-                            result = '>='
-                        elif isOp == '<=':
-                            result = '>'
-                        elif isOp == '>':
-                            result = '<='
-                        elif isOp == '>=':
-                            result = '<'
-                        elif isOp == '<<':
-                            result = '>>'
-                        elif isOp == '>>':
-                            result = '<<'
-                        
+                        result = self.NEGATIONS.get(isOp)
                         if result is not None:
                             if len(excess) > 0:
                                 result += ' ' + excess # append the qualifiers
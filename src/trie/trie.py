@@ -14,6 +14,8 @@ class Trie():
     def __init__(self):
         self.root = self.get_node()
         self.wordSet = set()
+        # The lowercase form of every word in wordSet, built on first request (see lower_words)
+        self.lowerWords = None
 
     def get_node(self):
         return TrieNode()
@@ -33,6 +35,7 @@ class Trie():
             root.count += 1
             if root.count == 1:
                 self.wordSet.add(word)
+                self.lowerWords = None
         root.terminating = True
 
     def word_count(self, word):
@@ -44,6 +47,14 @@ class Trie():
             root = root.children.get(index)
         return root.count
 
+    def lower_words(self) -> tuple:
+        '''
+        Returns the lowercase form of every word in the trie. The tuple is cached until the trie changes.
+        '''
+        if self.lowerWords is None:
+            self.lowerWords = tuple(word.lower() for word in self.wordSet)
+        return self.lowerWords
+
     def search(self, word) -> bool:
         root = self.root
 
@@ -81,6 +92,7 @@ class Trie():
                 return False
             root = root.children.get(index)
             self.wordSet.remove(word)
+            self.lowerWords = None
 
         if not root:
             return False
@@ -5,6 +5,7 @@ Created on Oct 16, 2021
 '''
 import string
 import nltk
+from functools import lru_cache
 from src.trie import verify
 
 
@@ -88,6 +89,9 @@ class TypeExtractor(object):
         return ret
 
 
+# The same tokens are checked by typify, standardization, the operator evaluator, and each type III pass,
+#  so the answers for recent tokens are remembered.
+@lru_cache(maxsize=1024)
 def isNumeric(token) -> bool:
     pos = 0
     notPunct = False
@@ -105,11 +109,12 @@ def isNumeric(token) -> bool:
 
 
 def toCleanNumber(x:string) -> string:
-    ret = ''
+    # The pieces are collected and joined once, rather than copying the result for every character kept
+    parts = []
     for c in x:
         if c in string.digits or c=='.':
-            ret += c
+            parts.append(c)
         elif c=='k' or c=='K':
-            ret += '000' # since k denotes a thousand
-    return ret
+            parts.append('000') # since k denotes a thousand
+    return ''.join(parts)
     